@@ -3,21 +3,61 @@ USC Blind Date Matcher
 Matches students based on compatibility scores from Google Form responses.
 """
 
+import numpy as np
 import pandas as pd
 import networkx as nx
 from networkx.algorithms import bipartite
 import sys
-from sentence_transformers import SentenceTransformer, util
+from scipy.optimize import linear_sum_assignment
+from model2vec import StaticModel
 
 # Global model variable - will be loaded lazily on first use
 _similarity_model = None
 
+# Single-choice form questions, loaded as pandas categoricals
+CATEGORICAL_COLUMNS = ['gender', 'social_battery', 'friday_night', 'dream_date', 'drinking', 'weed', 'ambition']
+
+SOCIAL_SCORES = {
+    "I'm out every night": 4,
+    "I like going out but also need my nights in": 3,
+    "Homebody but down for occasional plans": 2,
+    "Netflix is my best friend": 1
+}
+
+DRINKING_SCORES = {
+    "Go out/party regularly": 4,
+    "Social drinker": 3,
+    "Occasionally": 2,
+    "Nah, not for me": 1
+}
+
+# Map form traits to partner values
+TRAIT_TO_VALUE_MAP = {
+    'funny': 'sense of humor',
+    'smart': 'smart/intellectual',
+    'hardworking': 'ambition/has goals',
+    'ambitious/driven': 'ambition/has goals',
+    'adventurous': 'adventurous',
+    'kind/caring': 'kind/caring',
+    'life of the party': 'fun/spontaneous',
+    'spontaneous': 'fun/spontaneous',
+    'reliable/loyal': 'good communicator',  # Stretch but related
+}
+
+# How many of each person's highest-scoring pairs to keep as edges for matching
+MAX_EDGES_PER_PERSON = 10
+
+# Bit per gender, and the "I'm interested in" option that selects it
+GENDER_BITS = {'man': 1, 'woman': 2, 'other': 4}
+INTEREST_BITS = {'men': 1, 'women': 2, 'other': 4}
+
+# Number of set bits in each 16-bit value, for counting trait matches in bitmasks
+POPCOUNT = np.array([bin(value).count('1') for value in range(1 << 16)], dtype=np.uint8)
+
 
 def load_responses(csv_file):
     """Load Google Form responses from CSV file."""
-    df = pd.read_csv(csv_file)
-
-    # Rename columns to simpler names for easier access
+    # Simpler names for the form's columns, for easier access
     column_mapping = {
         'Timestamp': 'timestamp',
         'Name (first and last)': 'name',
@@ -42,6 +82,13 @@ def load_responses(csv_file):
         'Deal-breakers?': 'dealbreakers'
     }
 
+    # Single-choice questions only have a few possible answers - store them as categoricals
+    # so each distinct answer is processed once instead of once per person
+    categorical = {question: 'category' for question, column in column_mapping.items()
+                   if column in CATEGORICAL_COLUMNS}
+    # Only parse the columns we use (forms may have extra questions, or be missing some)
+    df = pd.read_csv(csv_file, usecols=lambda question: question in column_mapping, dtype=categorical)
+
     df = df.rename(columns=column_mapping)
     return df
 
@@ -54,218 +101,274 @@ def get_similarity_model():
     global _similarity_model
     if _similarity_model is None:
         print("Loading semantic similarity model (first time only)...")
-        # Using 'all-MiniLM-L6-v2' - small, fast, and good quality
-        _similarity_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Using 'potion-base-8M' - static embeddings (a lookup table, no transformer),
+        # so encoding is 100x+ faster on CPU than a sentence-transformer
+        _similarity_model = StaticModel.from_pretrained('minishlab/potion-base-8M')
         print("Model loaded!")
     return _similarity_model
 
 
-def calculate_text_similarity(text1, text2):
+def _normalize_rows(embeddings):
+    """Scale each embedding to unit length (all-zero rows stay zero)."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+
+def smart_encode(model, texts, batch_size=64):
     """
-    Calculate semantic similarity between two texts using sentence embeddings.
-    Returns a score from 0 (completely different) to 1 (identical meaning).
+    Encode texts in batches, encoding each distinct text only once.
+    Texts are sorted by length first so each batch holds similar-length texts
+    (little padding), and the embeddings are returned in the original order.
     """
-    # Handle empty or null values
-    text1 = str(text1).strip()
-    text2 = str(text2).strip()
+    unique_texts, inverse = np.unique(texts, return_inverse=True)
+    order = np.argsort([len(text) for text in unique_texts], kind='stable')
 
-    if not text1 or not text2 or text1 == 'nan' or text2 == 'nan':
-        return 0.0
+    sorted_embeddings = model.encode([str(unique_texts[k]) for k in order], batch_size=batch_size)
+    embeddings = np.empty_like(sorted_embeddings)
+    embeddings[order] = sorted_embeddings
 
-    # Get the model
-    model = get_similarity_model()
+    return embeddings[inverse.reshape(-1)]
 
-    # Encode both texts
-    embedding1 = model.encode(text1, convert_to_tensor=True)
-    embedding2 = model.encode(text2, convert_to_tensor=True)
 
-    # Calculate cosine similarity
-    similarity = util.cos_sim(embedding1, embedding2).item()
+def encode_normalized(texts):
+    """
+    Encode texts with the similarity model as unit-length embeddings (one row per text),
+    so the cosine similarity of two rows is a plain dot product.
+    """
+    return _normalize_rows(smart_encode(get_similarity_model(), texts))
 
-    # Clamp to [0, 1] range
-    return max(0.0, min(1.0, similarity))
 
+def build_description(person):
+    """Build a short description of a person from their traits and hobbies."""
+    return f"Personality: {person.get('self_traits', '')}. Hobbies: {person.get('hobbies', '')}."
 
-def is_compatible_orientation(person1, person2):
+
+def text_similarity_matrix(df):
+    """
+    Calculate type-vs-description similarity for every pair of people at once.
+    Entry [i, j] is how well person i's described "type" matches person j (0 to 1).
+    All texts are encoded in one batched call instead of once per pair.
+    """
+    n = len(df)
+    if n == 0:
+        return np.zeros((0, 0))
+    records = df.to_dict('records')
+
+    # Get type descriptions and build a description of each person
+    types = [str(person.get('type_description', '')).strip() for person in records]
+    descriptions = [build_description(person) for person in records]
+
+    try:
+        type_embeddings = encode_normalized(types)
+        description_embeddings = encode_normalized(descriptions)
+    except Exception as e:
+        # If text similarity fails for any reason, just skip it
+        print(f"Warning: Text similarity calculation failed: {e}")
+        return np.zeros((n, n))
+
+    # People who didn't describe their type get no similarity with anyone
+    for i, text in enumerate(types):
+        if not text or text == 'nan':
+            type_embeddings[i] = 0
+
+    # Cosine similarity of normalized embeddings, clamped to [0, 1]
+    similarity = type_embeddings @ description_embeddings.T
+    return np.clip(similarity, 0.0, 1.0)
+
+
+def _gender_bit(gender):
+    """Get the GENDER_BITS bit for a gender answer (0 if unknown)."""
+    gender = str(gender).lower().strip()
+    # Check 'woman' before 'man' since one contains the other
+    if 'woman' in gender:
+        return GENDER_BITS['woman']
+    if 'non-binary' in gender or 'other' in gender:
+        return GENDER_BITS['other']
+    if 'man' in gender:
+        return GENDER_BITS['man']
+    return 0
+
+
+def encode_orientation(df):
+    """
+    Encode each person's gender and what genders they're interested in as bitmasks.
+    Returns (gender_mask, interest_mask) uint8 arrays with one entry per person.
+    """
+    gender_mask = np.array([_gender_bit(g) for g in df.get('gender', [''] * len(df))], dtype=np.uint8)
+
+    # "I'm interested in" is a checkbox field, so it's comma-separated
+    interest_mask = np.zeros(len(df), dtype=np.uint8)
+    for row, interested in enumerate(df.get('interested_in', [''] * len(df))):
+        for option in str(interested).lower().split(','):
+            interest_mask[row] |= INTEREST_BITS.get(option.strip(), 0)
+
+    return gender_mask, interest_mask
+
+
+def is_compatible_orientation(gender_mask, interest_mask, i, j):
     """
     Check if two people are compatible based on gender and what genders they're interested in.
-    Uses the "I'm interested in" field from the form.
+    Uses the "I'm interested in" field from the form, encoded by encode_orientation.
+    i and j are indices (or broadcastable index arrays) into the masks.
     """
-    gender1 = str(person1.get('gender', '')).lower().strip()
-    gender2 = str(person2.get('gender', '')).lower().strip()
-
-    # Get what each person is interested in (this is a checkbox field, so it's comma-separated)
-    # Split by comma and clean up whitespace
-    interested1_raw = str(person1.get('interested_in', '')).lower()
-    interested2_raw = str(person2.get('interested_in', '')).lower()
-
-    interested1 = [x.strip() for x in interested1_raw.split(',')]
-    interested2 = [x.strip() for x in interested2_raw.split(',')]
-
-    # Check if person1 is interested in person2's gender
-    person1_interested = False
-    if 'men' in interested1 and 'man' in gender2:
-        person1_interested = True
-    elif 'women' in interested1 and 'woman' in gender2:
-        person1_interested = True
-    elif 'other' in interested1 and ('non-binary' in gender2 or 'other' in gender2):
-        person1_interested = True
-
-    if not person1_interested:
-        return False
-
-    # Check if person2 is interested in person1's gender
-    person2_interested = False
-    if 'men' in interested2 and 'man' in gender1:
-        person2_interested = True
-    elif 'women' in interested2 and 'woman' in gender1:
-        person2_interested = True
-    elif 'other' in interested2 and ('non-binary' in gender1 or 'other' in gender1):
-        person2_interested = True
-
-    if not person2_interested:
-        return False
+    # Check if person1 is interested in person2's gender, and vice versa
+    person1_interested = (interest_mask[i] & gender_mask[j]) != 0
+    person2_interested = (interest_mask[j] & gender_mask[i]) != 0
 
     # Both must be interested in each other's gender
-    return True
+    return person1_interested & person2_interested
+
+
+def _get_column(df, name):
+    """Get a column from the responses, or an all-missing column if the form didn't ask it."""
+    if name in df:
+        return df[name]
+    return pd.Series(np.nan, index=df.index)
 
 
-def check_dealbreakers(person1, person2):
+def _split_options(value, lower=False):
+    """Split a comma-separated checkbox answer into a set of options."""
+    if pd.isna(value):
+        return set()
+    value = str(value)
+    if lower:
+        value = value.lower()
+    return set(value.split(', '))
+
+
+def _shared_options_matrix(answers):
     """
-    Check if either person has dealbreakers that eliminate compatibility.
-    Returns True if compatible, False if dealbreakers exist.
+    Count how many options every pair of people picked in common on a checkbox question.
+    One-hot encodes the answers (one column per option) so all the counts come from
+    a single matrix multiply.
     """
-    dealbreakers1 = str(person1.get('dealbreakers', '')).lower()
-    dealbreakers2 = str(person2.get('dealbreakers', '')).lower()
+    one_hot = answers.fillna('').astype(str).str.get_dummies(sep=', ').to_numpy(np.float32)
+    return one_hot @ one_hot.T
+
 
-    # Check if person1's dealbreakers eliminate person2
-    if 'smoker' in dealbreakers1:
-        if person2.get('weed', '').lower() == 'yes':
-            return False
+def _trait_map_bits(entries, options):
+    """Bitmask with bit k set if the k-th TRAIT_TO_VALUE_MAP entry (key or value) is in options."""
+    return sum(1 << bit for bit, entry in enumerate(entries) if entry in options)
 
-    if 'bad communicator' in dealbreakers1:
-        # We don't have a direct "communication" question, so skip this check
-        pass
 
-    # Check if person2's dealbreakers eliminate person1
-    if 'smoker' in dealbreakers2:
-        if person1.get('weed', '').lower() == 'yes':
-            return False
+def vectorize_df(df):
+    """
+    Convert responses into NumPy arrays (one entry per person) so that scores
+    for every pair can be computed at once with broadcasting.
+    """
+    def categories(name):
+        return _get_column(df, name).astype('category')
+
+    def codes(name):
+        # Integer id per distinct answer, -1 for missing
+        return categories(name).cat.codes.to_numpy(np.int32)
+
+    def by_answer(name, func, dtype):
+        # Evaluate func once per distinct answer (and once for missing), not once per person
+        answers = categories(name)
+        per_answer = [func(answer) for answer in answers.cat.categories] + [func(np.nan)]
+        return np.array(per_answer, dtype=dtype)[answers.cat.codes.to_numpy()]
+
+    importance = pd.to_numeric(_get_column(df, 'shared_interests_importance'), errors='coerce')
+    values_lower = [_split_options(v, lower=True) for v in _get_column(df, 'partner_values')]
+    traits_lower = [_split_options(v, lower=True) for v in _get_column(df, 'self_traits')]
+
+    return {
+        'social': by_answer('social_battery', lambda answer: SOCIAL_SCORES.get(answer, 0), np.int8),
+        'drinking': by_answer('drinking', lambda answer: DRINKING_SCORES.get(answer, 0), np.int8),
+        'friday': codes('friday_night'),
+        'dream_date': codes('dream_date'),
+        'weed': codes('weed'),
+        'weed_yes': by_answer('weed', lambda answer: str(answer).lower() == 'yes', bool),
+        'ambition': codes('ambition'),
+        'ambition_balanced': by_answer('ambition', lambda answer: 'Balanced' in str(answer), bool),
+        'shared_imp': importance.fillna(3).to_numpy(np.float32),
+        # n x n matrices of how many options each pair has in common
+        'shared_hobbies': _shared_options_matrix(_get_column(df, 'hobbies')),
+        'shared_values': _shared_options_matrix(_get_column(df, 'partner_values')),
+        # One bit per TRAIT_TO_VALUE_MAP entry
+        'wants_bits': np.array([_trait_map_bits(TRAIT_TO_VALUE_MAP.keys(), values) for values in values_lower],
+                               dtype=np.uint16),
+        'has_bits': np.array([_trait_map_bits(TRAIT_TO_VALUE_MAP.values(), traits) for traits in traits_lower],
+                             dtype=np.uint16),
+        'dealbreaker_smoker': by_answer('dealbreakers', lambda answer: 'smoker' in str(answer).lower(), bool),
+    }
 
-    if 'bad communicator' in dealbreakers2:
-        pass
 
-    return True
+def check_dealbreakers(features, i, j):
+    """
+    Check if either person has dealbreakers that eliminate compatibility.
+    i and j are indices (or broadcastable index arrays) into the vectorize_df arrays.
+    Returns True where compatible, False where dealbreakers exist.
+    """
+    smoker_dealbreaker = features['dealbreaker_smoker']
+    weed_yes = features['weed_yes']
+
+    # Check if person1's dealbreakers eliminate person2, and vice versa
+    # ("Bad communicator" isn't checked - we don't have a direct "communication" question)
+    return ~((smoker_dealbreaker[i] & weed_yes[j]) | (smoker_dealbreaker[j] & weed_yes[i]))
 
 
-def calculate_compatibility_score(person1, person2):
+def calculate_compatibility_score(features, similarity, i, j):
     """
     Calculate compatibility score between two people (0-100).
     Higher score = better match.
+    i and j are indices into the vectorize_df arrays; pass broadcastable index arrays
+    (e.g. a column and a row of indices) to score many pairs in one call.
+    similarity is the text_similarity_matrix for the same people.
     """
-    score = 0
+    score = np.zeros(np.broadcast(i, j).shape)
 
     # Social battery compatibility (15 points max)
-    social1 = person1.get('social_battery', '')
-    social2 = person2.get('social_battery', '')
-    social_scores = {
-        "I'm out every night": 4,
-        "I like going out but also need my nights in": 3,
-        "Homebody but down for occasional plans": 2,
-        "Netflix is my best friend": 1
-    }
-    if social1 in social_scores and social2 in social_scores:
-        social_diff = abs(social_scores[social1] - social_scores[social2])
-        score += max(0, 15 - (social_diff * 5))  # Closer social levels = higher score
+    social1 = features['social'][i].astype(int)
+    social2 = features['social'][j].astype(int)
+    social_diff = np.abs(social1 - social2)
+    # Closer social levels = higher score
+    score += np.where((social1 > 0) & (social2 > 0), np.maximum(0, 15 - (social_diff * 5)), 0)
 
     # Friday night compatibility (10 points max)
-    if person1.get('friday_night') == person2.get('friday_night'):
-        score += 10
+    friday1 = features['friday'][i]
+    score += np.where((friday1 >= 0) & (friday1 == features['friday'][j]), 10, 0)
 
     # Shared hobbies (20 points max)
-    hobbies1 = set(str(person1.get('hobbies', '')).split(', '))
-    hobbies2 = set(str(person2.get('hobbies', '')).split(', '))
-    shared_hobbies = len(hobbies1.intersection(hobbies2))
+    shared_hobbies = features['shared_hobbies'][i, j]
 
     # Weight by how important shared interests are to each person
-    importance1 = person1.get('shared_interests_importance', 3)
-    importance2 = person2.get('shared_interests_importance', 3)
-    avg_importance = (float(importance1) + float(importance2)) / 2
+    avg_importance = (features['shared_imp'][i] + features['shared_imp'][j]) / 2
 
     hobby_score = (shared_hobbies / 3) * 20  # Max 3 shared hobbies
     hobby_score *= (avg_importance / 5)  # Scale by importance
     score += hobby_score
 
     # Dream date compatibility (10 points max)
-    if person1.get('dream_date') == person2.get('dream_date'):
-        score += 10
+    dream_date1 = features['dream_date'][i]
+    score += np.where((dream_date1 >= 0) & (dream_date1 == features['dream_date'][j]), 10, 0)
 
     # Drinking compatibility (10 points max)
-    drinking1 = person1.get('drinking', '')
-    drinking2 = person2.get('drinking', '')
-    drinking_scores = {
-        "Go out/party regularly": 4,
-        "Social drinker": 3,
-        "Occasionally": 2,
-        "Nah, not for me": 1
-    }
-    if drinking1 in drinking_scores and drinking2 in drinking_scores:
-        drinking_diff = abs(drinking_scores[drinking1] - drinking_scores[drinking2])
-        score += max(0, 10 - (drinking_diff * 3))
+    drinking1 = features['drinking'][i].astype(int)
+    drinking2 = features['drinking'][j].astype(int)
+    drinking_diff = np.abs(drinking1 - drinking2)
+    score += np.where((drinking1 > 0) & (drinking2 > 0), np.maximum(0, 10 - (drinking_diff * 3)), 0)
 
     # Weed compatibility (5 points max)
-    if person1.get('weed') == person2.get('weed'):
-        score += 5
+    weed1 = features['weed'][i]
+    score += np.where((weed1 >= 0) & (weed1 == features['weed'][j]), 5, 0)
 
     # Ambition compatibility (10 points max)
-    ambition1 = str(person1.get('ambition', ''))
-    ambition2 = str(person2.get('ambition', ''))
-    if ambition1 == ambition2 and ambition1 != '':
-        score += 10
-    elif 'Balanced' in ambition1 or 'Balanced' in ambition2:
-        score += 5  # Balanced can work with most people
+    ambition1 = features['ambition'][i]
+    same_ambition = (ambition1 >= 0) & (ambition1 == features['ambition'][j])
+    either_balanced = features['ambition_balanced'][i] | features['ambition_balanced'][j]
+    score += np.where(same_ambition, 10, np.where(either_balanced, 5, 0))  # Balanced can work with most people
 
     # Partner values alignment (5 points max)
     # Give points if they value similar things in a partner
-    values1 = set(str(person1.get('partner_values', '')).split(', '))
-    values2 = set(str(person2.get('partner_values', '')).split(', '))
-    shared_values = len(values1.intersection(values2))
+    shared_values = features['shared_values'][i, j]
     score += (shared_values / 3) * 5  # Max 3 shared values = 5 points
 
     # Trait matching (15 points max)
-    # Match what person1 wants with person2's traits, and vice versa
-    # Map form traits to partner values
-    trait_to_value_map = {
-        'funny': 'sense of humor',
-        'smart': 'smart/intellectual',
-        'hardworking': 'ambition/has goals',
-        'ambitious/driven': 'ambition/has goals',
-        'adventurous': 'adventurous',
-        'kind/caring': 'kind/caring',
-        'life of the party': 'fun/spontaneous',
-        'spontaneous': 'fun/spontaneous',
-        'reliable/loyal': 'good communicator',  # Stretch but related
-    }
-
-    # Get traits (how friends describe them)
-    traits1 = set(str(person1.get('self_traits', '')).lower().split(', '))
-    traits2 = set(str(person2.get('self_traits', '')).lower().split(', '))
-
-    # Get partner values (what they want)
-    p1_values = set(str(person1.get('partner_values', '')).lower().split(', '))
-    p2_values = set(str(person2.get('partner_values', '')).lower().split(', '))
-
-    # Check how many of person1's desired traits person2 actually has
-    p1_match_count = 0
-    for value, trait in trait_to_value_map.items():
-        if value in p1_values and trait in traits2:
-            p1_match_count += 1
-
-    # Check how many of person2's desired traits person1 actually has
-    p2_match_count = 0
-    for value, trait in trait_to_value_map.items():
-        if value in p2_values and trait in traits1:
-            p2_match_count += 1
+    # Check how many of person1's desired traits person2 actually has, and vice versa
+    p1_match_count = POPCOUNT[features['wants_bits'][i] & features['has_bits'][j]]
+    p2_match_count = POPCOUNT[features['wants_bits'][j] & features['has_bits'][i]]
 
     # Average the two-way match and give up to 15 points
     avg_trait_matches = (p1_match_count + p2_match_count) / 2
@@ -273,38 +376,63 @@ def calculate_compatibility_score(person1, person2):
 
     # Text similarity matching (10 points max)
     # Compare what person1 describes as their "type" with person2's actual description
-    # and vice versa
-    try:
-        # Get type descriptions
-        p1_type = str(person1.get('type_description', '')).strip()
-        p2_type = str(person2.get('type_description', '')).strip()
-
-        # Build a description of each person from their traits and hobbies
-        p1_description = f"Personality: {person1.get('self_traits', '')}. Hobbies: {person1.get('hobbies', '')}."
-        p2_description = f"Personality: {person2.get('self_traits', '')}. Hobbies: {person2.get('hobbies', '')}."
-
-        # Calculate how well person1's desired type matches person2
-        if p1_type and p1_type != 'nan':
-            similarity_1_to_2 = calculate_text_similarity(p1_type, p2_description)
-        else:
-            similarity_1_to_2 = 0.0
-
-        # Calculate how well person2's desired type matches person1
-        if p2_type and p2_type != 'nan':
-            similarity_2_to_1 = calculate_text_similarity(p2_type, p1_description)
-        else:
-            similarity_2_to_1 = 0.0
-
-        # Average the two-way similarity and award up to 10 points
-        avg_text_similarity = (similarity_1_to_2 + similarity_2_to_1) / 2
-        score += avg_text_similarity * 10
+    # and vice versa (see text_similarity_matrix)
+    avg_text_similarity = (similarity[i, j] + similarity[j, i]) / 2
+    score += avg_text_similarity * 10
 
-    except Exception as e:
-        # If text similarity fails for any reason, just skip it
-        print(f"Warning: Text similarity calculation failed: {e}")
-        pass
+    return np.minimum(100, score)  # Cap at 100
 
-    return min(100, score)  # Cap at 100
+
+def keep_top_edges(candidates, scores, k):
+    """
+    Prune the candidate pairs (an upper-triangular boolean matrix) to each person's
+    k highest-scoring ones. A pair is kept if it's in the top k of either person.
+    scores is a symmetric matrix of pair scores (any sign).
+    """
+    n = len(candidates)
+    if n <= k:
+        return candidates
+
+    edge_scores = np.where(candidates | candidates.T, scores, -np.inf)
+    top = np.argpartition(-edge_scores, k - 1, axis=1)[:, :k]
+
+    keep = np.zeros_like(candidates)
+    np.put_along_axis(keep, top, True, axis=1)
+    return candidates & (keep | keep.T)
+
+
+def max_weight_matching(G):
+    """
+    Find the maximum weight matching of the compatibility graph.
+    Returns a set of (i, j) node pairs.
+
+    Each connected component is matched on its own. Bipartite components (e.g. everyone
+    is straight) are an assignment problem, solved in C by scipy's linear_sum_assignment.
+    Only the other components fall back to networkx's (pure Python) blossom algorithm.
+    """
+    matching = set()
+
+    for component in nx.connected_components(G):
+        if len(component) < 2:
+            continue
+        subgraph = G.subgraph(component)
+
+        try:
+            coloring = bipartite.color(subgraph)
+        except nx.NetworkXError:
+            matching |= nx.max_weight_matching(subgraph, maxcardinality=False)
+            continue
+
+        group_a = [node for node, color in coloring.items() if color == 0]
+        group_b = [node for node, color in coloring.items() if color == 1]
+        weights = bipartite.biadjacency_matrix(subgraph, row_order=group_a, column_order=group_b).toarray()
+
+        row_ind, col_ind = linear_sum_assignment(weights, maximize=True)
+
+        # People without a compatible partner get assigned over a 0-weight non-edge - drop those
+        matching |= {(group_a[r], group_b[c]) for r, c in zip(row_ind, col_ind) if weights[r, c] > 0}
+
+    return matching
 
 
 def find_matches(df):
@@ -314,51 +442,55 @@ def find_matches(df):
     """
     # Create compatibility matrix
     n = len(df)
-    compatibility = {}
+
+    # Plain dicts are much cheaper to access than df.iloc rows
+    records = df.to_dict('records')
 
     print(f"Calculating compatibility for {n} people...")
 
-    for i in range(n):
-        for j in range(i + 1, n):
-            person1 = df.iloc[i]
-            person2 = df.iloc[j]
+    features = vectorize_df(df)
+    rows, cols = np.arange(n)[:, None], np.arange(n)[None, :]
 
-            # Check orientation compatibility
-            if not is_compatible_orientation(person1, person2):
-                continue
+    # Only consider each pair once, and skip incompatible orientations and
+    # dealbreakers - these checks are cheap, so do them before any text work
+    gender_mask, interest_mask = encode_orientation(df)
+    viable = np.triu(is_compatible_orientation(gender_mask, interest_mask, rows, cols)
+                     & check_dealbreakers(features, rows, cols), k=1)
 
-            # Check dealbreakers
-            if not check_dealbreakers(person1, person2):
-                continue
+    # Encode the free-text fields once, only for people with a viable partner
+    active = np.flatnonzero(viable.any(axis=0) | viable.any(axis=1))
+    similarity = np.zeros((n, n))
+    similarity[np.ix_(active, active)] = text_similarity_matrix(df.iloc[active])
 
-            # Calculate compatibility score
-            score = calculate_compatibility_score(person1, person2)
+    # Score every pair at once, and skip zero scores
+    scores = calculate_compatibility_score(features, similarity, rows, cols)
+    candidates = viable & (scores > 0)
 
-            if score > 0:
-                compatibility[(i, j)] = score
+    print(f"Found {np.count_nonzero(candidates)} compatible pairs")
 
-    print(f"Found {len(compatibility)} compatible pairs")
+    # Low-scoring pairs almost never end up in the best matching, so only keep
+    # each person's strongest ones - this keeps the matching graph small
+    candidates = keep_top_edges(candidates, scores, MAX_EDGES_PER_PERSON)
 
     # Create graph for matching
     G = nx.Graph()
 
     # Add all people as nodes
-    for i in range(n):
-        G.add_node(i)
+    G.add_nodes_from(range(n))
 
     # Add edges with weights (compatibility scores)
-    for (i, j), score in compatibility.items():
-        G.add_edge(i, j, weight=score)
+    for i, j in zip(*np.nonzero(candidates)):
+        G.add_edge(int(i), int(j), weight=float(scores[i, j]))
 
     # Find maximum weight matching
-    matching = nx.max_weight_matching(G, maxcardinality=False)
+    matching = max_weight_matching(G)
 
     # Convert to readable format
     matches = []
     for i, j in matching:
-        person1 = df.iloc[i]
-        person2 = df.iloc[j]
-        score = compatibility.get((min(i, j), max(i, j)), 0)
+        person1 = records[i]
+        person2 = records[j]
+        score = G[i][j]['weight']
         matches.append((person1, person2, score))
 
     # Sort by compatibility score (highest first)
@@ -7,22 +7,104 @@ IMPORTANT: This uses unofficial LinkedIn scraping. Use responsibly and at your o
 Consider LinkedIn's Terms of Service before using in production.
 """
 
+import numpy as np
 import pandas as pd
 import anthropic
 import os
 import sys
 import json
+import math
+import asyncio
+import logging
+import hashlib
+import random
+import sqlite3
 import networkx as nx
 from typing import Dict, List, Tuple, Optional
 from linkedin_api import Linkedin
+from tqdm import tqdm
 import time
+from matcher import (encode_orientation, is_compatible_orientation, max_weight_matching,
+                     keep_top_edges, encode_normalized)
+
+CLAUDE_MODEL = "claude-sonnet-4-20250514"
+
+# Only each person's most similar candidates (by profile embeddings) are sent to Claude -
+# very dissimilar pairs almost never end up in the best matching
+MAX_CANDIDATES_PER_PERSON = 10
+
+# How many Claude API requests to have in flight at once, and how many may start
+# per minute (keep this at or below your API tier's requests-per-minute limit)
+MAX_CONCURRENT_REQUESTS = 20
+REQUESTS_PER_MINUTE = 50
+
+# How many times to retry a request that was rate limited (429) or hit a server
+# error - the client backs off exponentially between attempts
+MAX_RETRIES = 5
+
+# How many candidates to evaluate against one person in a single prompt,
+# and the response token budget for each of them (one evaluation is ~250 tokens)
+PAIRS_PER_PROMPT = 8
+MAX_TOKENS_PER_PAIR = 384
+
+# Low temperature keeps scores consistent between runs
+TEMPERATURE = 0.2
+
+# Prompts are cut into smaller groups when they'd grow past this many input tokens
+# (estimated at CHARS_PER_TOKEN characters per token)
+MAX_PROMPT_TOKENS = 8000
+CHARS_PER_TOKEN = 4
+
+# Token budgets for a person's profile, and for each free-text answer in it
+MAX_PROFILE_TOKENS = 400
+MAX_FREE_TEXT_TOKENS = 80
+
+# Instructions for every compatibility evaluation. This is identical for every request
+# (only the profiles in the user message change), so keep it free of per-run details.
+SYSTEM_PROMPT = """You are an expert matchmaker analyzing compatibility between USC students for a blind date matching program.
+
+You'll be given the main person's profile (PERSON A) and the profiles of several candidates to evaluate against PERSON A (CANDIDATE <number>).
+
+For each candidate separately, please analyze their compatibility with PERSON A across these dimensions:
+1. Personality compatibility (traits, social energy, lifestyle)
+2. Shared interests and hobbies
+3. What each person wants vs. what the other person offers
+4. Lifestyle alignment (drinking, ambition, social habits)
+5. Deal-breakers (if any)
+
+Provide your analysis in JSON format, with one evaluation per candidate:
+{
+    "evaluations": [
+        {
+            "id": <candidate number>,
+            "compatibility_score": <number 0-100>,
+            "reasoning": "<2-3 sentence explanation>",
+            "shared_interests": ["<interest1>", "<interest2>"],
+            "key_matches": ["<what makes them compatible>"],
+            "potential_concerns": ["<any concerns>"]
+        }
+    ]
+}
+
+Be honest - some matches will be great (80-100), some okay (50-79), some poor (0-49)."""
+
+# Claude's reply is prefilled with this, so it always starts straight into the JSON object
+JSON_PREFILL = "{"
+
+# How often to check whether a Message Batches API submission has finished
+BATCH_POLL_SECONDS = 30
+
+# How many LinkedIn profiles to fetch at once, and the (jittered) pause after each fetch
+MAX_CONCURRENT_LINKEDIN_FETCHES = 8
+LINKEDIN_DELAY_SECONDS = 1
+
+# Local SQLite cache so reruns can skip work that's already been done
+CACHE_FILE = 'matcher_cache.sqlite'
 
 
 def load_responses(csv_file):
     """Load Google Form responses from CSV file."""
-    df = pd.read_csv(csv_file)
-
-    # Rename columns to simpler names for easier access
+    # Simpler names for the form's columns, for easier access
     column_mapping = {
         'Timestamp': 'timestamp',
         'Name (first and last)': 'name',
@@ -48,6 +130,12 @@ def load_responses(csv_file):
         'Deal-breakers?': 'dealbreakers'
     }
 
+    # Only parse the columns we use (forms may have extra questions, or be missing some).
+    # Every answer just goes into Claude's prompt as text, so read them all as plain
+    # strings - unanswered questions become '' instead of NaN
+    df = pd.read_csv(csv_file, usecols=lambda question: question in column_mapping,
+                     dtype=str, na_filter=False)
+
     df = df.rename(columns=column_mapping)
     return df
 
@@ -84,8 +172,6 @@ def get_linkedin_data(linkedin_client: Optional[Linkedin], linkedin_url: str) ->
         if not username:
             return None
 
-        print(f"    Fetching LinkedIn data for {username}...", end=" ")
-
         # Get profile data
         profile = linkedin_client.get_profile(username)
 
@@ -120,195 +206,518 @@ def get_linkedin_data(linkedin_client: Optional[Linkedin], linkedin_url: str) ->
         skills = profile.get('skills', [])
         linkedin_data['skills'] = [skill.get('name', '') for skill in skills[:10]]  # Top 10 skills
 
-        print("✓")
+        return linkedin_data
 
-        # Add small delay to avoid rate limiting
-        time.sleep(1)
+    except Exception as e:
+        logging.warning(f"Could not fetch LinkedIn data for {linkedin_url}: {e}")
+        return None
 
-        return linkedin_data
 
+def open_cache(cache_file=CACHE_FILE):
+    """
+    Open the local SQLite cache, creating its tables if needed.
+    linkedin_cache holds fetched LinkedIn data by username, compat_cache holds
+    Claude's evaluations by pair_cache_key, and pending_batches holds Message Batches
+    API submissions whose results haven't been read yet.
+    """
+    cache = sqlite3.connect(cache_file)
+    cache.execute("CREATE TABLE IF NOT EXISTS linkedin_cache (username TEXT PRIMARY KEY, json TEXT)")
+    cache.execute("CREATE TABLE IF NOT EXISTS compat_cache (key TEXT PRIMARY KEY, json TEXT)")
+    cache.execute("CREATE TABLE IF NOT EXISTS pending_batches (id TEXT PRIMARY KEY, groups TEXT)")
+    return cache
+
+
+async def fetch_all_linkedin_data(linkedin_client, records, cache):
+    """
+    Fetch LinkedIn data for everyone with a LinkedIn URL into person['linkedin_data'].
+    Profiles already in the cache are reused. The rest are fetched up to
+    MAX_CONCURRENT_LINKEDIN_FETCHES at a time (linkedin_api is synchronous, so each
+    fetch runs in a worker thread) and saved to the cache.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_LINKEDIN_FETCHES)
+
+    async def fetch(person, username):
+        async with semaphore:
+            linkedin_data = await asyncio.to_thread(get_linkedin_data, linkedin_client, person['linkedin_url'])
+            # Add small, jittered delay to avoid rate limiting
+            await asyncio.sleep(LINKEDIN_DELAY_SECONDS * random.uniform(0.5, 1.5))
+
+        person['linkedin_data'] = linkedin_data
+        if linkedin_data:
+            cache.execute("INSERT OR REPLACE INTO linkedin_cache VALUES (?, ?)",
+                          (username, json.dumps(linkedin_data)))
+        progress.update()
+
+    fetches = []
+    for person in records:
+        username = extract_linkedin_username(person.get('linkedin_url'))
+        if not username:
+            continue
+
+        cached = cache.execute("SELECT json FROM linkedin_cache WHERE username = ?", (username,)).fetchone()
+        if cached:
+            person['linkedin_data'] = json.loads(cached[0])
+        else:
+            fetches.append(fetch(person, username))
+
+    with tqdm(total=len(fetches), desc="LinkedIn profiles", unit="profile", disable=not fetches) as progress:
+        await asyncio.gather(*fetches)
+    cache.commit()
+
+
+def profile_similarity_matrix(profiles):
+    """
+    Cosine similarity between every pair of create_person_profile strings, using
+    matcher.py's local embedding model (one encode per person, no API calls).
+    Returns None if the similarity can't be calculated.
+    """
+    try:
+        embeddings = encode_normalized(profiles)
     except Exception as e:
-        print(f"✗ (Error: {str(e)})")
+        logging.warning(f"Profile similarity calculation failed: {e}")
         return None
 
+    return embeddings @ embeddings.T
 
-def is_compatible_orientation(person1, person2):
-    """Check if two people are compatible based on gender and interested in."""
-    gender1 = str(person1.get('gender', '')).lower().strip()
-    gender2 = str(person2.get('gender', '')).lower().strip()
 
-    interested1_raw = str(person1.get('interested_in', '')).lower()
-    interested2_raw = str(person2.get('interested_in', '')).lower()
+def encode_quick_filters(df):
+    """
+    Lowercase the answers quick_incompatibility needs once, as one flag array per check.
+    Returns a dict of boolean arrays with one entry per person.
+    """
+    def answers(name):
+        if name not in df:
+            return pd.Series('', index=df.index)
+        return df[name].fillna('').astype(str).str.lower().str.strip()
+
+    looking_for = answers('looking_for')
+    return {
+        'dealbreaker_smoker': answers('dealbreakers').str.contains('smoker', regex=False).to_numpy(),
+        'weed_yes': (answers('weed') == 'yes').to_numpy(),
+        'wants_slink': looking_for.str.startswith('slink').to_numpy(),
+        'wants_spouse': looking_for.str.startswith('husband/wife').to_numpy(),
+    }
 
-    interested1 = [x.strip() for x in interested1_raw.split(',')]
-    interested2 = [x.strip() for x in interested2_raw.split(',')]
 
-    # Check if person1 is interested in person2's gender
-    person1_interested = False
-    if 'men' in interested1 and 'man' in gender2:
-        person1_interested = True
-    elif 'women' in interested1 and 'woman' in gender2:
-        person1_interested = True
-    elif 'other' in interested1 and ('non-binary' in gender2 or 'other' in gender2):
-        person1_interested = True
+def quick_incompatibility(flags, i, j):
+    """
+    Check for obvious mismatches that would make Claude score a pair near zero anyway,
+    so those pairs can be skipped without an API call.
+    i and j are indices (or broadcastable index arrays) into the encode_quick_filters arrays.
+    Returns True where the pair is clearly incompatible.
+    """
+    # One person won't date a smoker and the other smokes
+    smoker_conflict = ((flags['dealbreaker_smoker'][i] & flags['weed_yes'][j])
+                       | (flags['dealbreaker_smoker'][j] & flags['weed_yes'][i]))
 
-    if not person1_interested:
-        return False
+    # One person wants a slink and the other wants a husband/wife
+    intention_conflict = ((flags['wants_slink'][i] & flags['wants_spouse'][j])
+                          | (flags['wants_slink'][j] & flags['wants_spouse'][i]))
 
-    # Check if person2 is interested in person1's gender
-    person2_interested = False
-    if 'men' in interested2 and 'man' in gender1:
-        person2_interested = True
-    elif 'women' in interested2 and 'woman' in gender1:
-        person2_interested = True
-    elif 'other' in interested2 and ('non-binary' in gender1 or 'other' in gender1):
-        person2_interested = True
+    return smoker_conflict | intention_conflict
 
-    if not person2_interested:
-        return False
 
-    return True
+def truncate_text(text, max_tokens):
+    """Cut text down to about max_tokens tokens, at a word boundary."""
+    text = str(text)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + "..."
 
 
 def create_person_profile(person):
-    """Create a readable profile string for Claude to analyze."""
+    """
+    Create a readable profile string for Claude to analyze.
+    Free-text answers are capped at MAX_FREE_TEXT_TOKENS, and LinkedIn details are
+    only added while the whole profile stays within MAX_PROFILE_TOKENS.
+    """
     profile = f"""
 Name: {person['name']}
 Gender: {person.get('gender', 'N/A')}
 Year: {person.get('year', 'N/A')}
 Looking for: {person.get('looking_for', 'N/A')}
 
-Personality Traits: {person.get('self_traits', 'N/A')}
+Personality Traits: {truncate_text(person.get('self_traits', 'N/A'), MAX_FREE_TEXT_TOKENS)}
 Social Battery: {person.get('social_battery', 'N/A')}
 Friday Nights: {person.get('friday_night', 'N/A')}
-Hobbies: {person.get('hobbies', 'N/A')}
-Dream Date: {person.get('dream_date', 'N/A')}
+Hobbies: {truncate_text(person.get('hobbies', 'N/A'), MAX_FREE_TEXT_TOKENS)}
+Dream Date: {truncate_text(person.get('dream_date', 'N/A'), MAX_FREE_TEXT_TOKENS)}
 
 Lifestyle:
 - Drinking: {person.get('drinking', 'N/A')}
 - Weed: {person.get('weed', 'N/A')}
 - Ambition: {person.get('ambition', 'N/A')}
 
-What they value in a partner: {person.get('partner_values', 'N/A')}
+What they value in a partner: {truncate_text(person.get('partner_values', 'N/A'), MAX_FREE_TEXT_TOKENS)}
 Shared interests importance (1-5): {person.get('shared_interests_importance', 'N/A')}
-Their type: {person.get('type_description', 'N/A')}
-Deal-breakers: {person.get('dealbreakers', 'N/A')}
+Their type: {truncate_text(person.get('type_description', 'N/A'), MAX_FREE_TEXT_TOKENS)}
+Deal-breakers: {truncate_text(person.get('dealbreakers', 'N/A'), MAX_FREE_TEXT_TOKENS)}
 """.strip()
 
     # Add LinkedIn data if available
+    parts = [profile]
     linkedin_data = person.get('linkedin_data')
     if linkedin_data:
-        profile += "\n\nLINKEDIN PROFILE DATA:"
+        parts.append("\nLINKEDIN PROFILE DATA:")
 
         if linkedin_data.get('headline'):
-            profile += f"\nHeadline: {linkedin_data['headline']}"
+            parts.append(f"Headline: {truncate_text(linkedin_data['headline'], MAX_FREE_TEXT_TOKENS)}")
 
         if linkedin_data.get('summary'):
-            profile += f"\nSummary: {linkedin_data['summary'][:200]}..."  # Truncate long summaries
+            parts.append(f"Summary: {truncate_text(linkedin_data['summary'], MAX_FREE_TEXT_TOKENS)}")
 
         if linkedin_data.get('experience'):
-            profile += "\nExperience:"
+            parts.append("Experience:")
             for exp in linkedin_data['experience']:
                 if exp.get('title') and exp.get('company'):
-                    profile += f"\n  - {exp['title']} at {exp['company']}"
+                    parts.append(f"  - {exp['title']} at {exp['company']}")
 
         if linkedin_data.get('education'):
-            profile += "\nEducation:"
+            parts.append("Education:")
             for edu in linkedin_data['education']:
-                parts = []
+                details = []
                 if edu.get('degree'):
-                    parts.append(edu['degree'])
+                    details.append(edu['degree'])
                 if edu.get('field'):
-                    parts.append(edu['field'])
+                    details.append(edu['field'])
                 if edu.get('school'):
-                    parts.append(f"at {edu['school']}")
-                if parts:
-                    profile += f"\n  - {' '.join(parts)}"
+                    details.append(f"at {edu['school']}")
+                if details:
+                    parts.append(f"  - {' '.join(details)}")
 
         if linkedin_data.get('skills'):
-            profile += f"\nTop Skills: {', '.join(linkedin_data['skills'][:10])}"
+            parts.append(f"Top Skills: {', '.join(linkedin_data['skills'][:10])}")
+
+    # The survey answers are always kept (their free-text answers are capped above).
+    # LinkedIn lines are added in order while the profile stays within budget
+    max_chars = MAX_PROFILE_TOKENS * CHARS_PER_TOKEN
+    lines, length = parts[:1], len(parts[0])
+    for line in parts[1:]:
+        length += len(line) + 1
+        if length > max_chars:
+            break
+        lines.append(line)
+    # Don't leave a LinkedIn section heading with nothing under it
+    while len(lines) > 1 and lines[-1].endswith(':'):
+        lines.pop()
 
-    return profile
+    return "\n".join(lines)
 
 
-def evaluate_compatibility_with_claude(person1, person2, client):
+def build_compatibility_prompt(profile, candidates):
     """
-    Use Claude API to evaluate compatibility between two people.
-    Returns a compatibility score (0-100) and reasoning.
+    Build the user message asking Claude to evaluate one person against several
+    candidates at once. candidates is a list of (candidate id, profile) tuples.
+    The instructions are in SYSTEM_PROMPT, so only the profiles go here.
     """
-    profile1 = create_person_profile(person1)
-    profile2 = create_person_profile(person2)
+    candidate_profiles = "\n\n".join(
+        f"CANDIDATE {candidate_id}:\n{candidate_profile}" for candidate_id, candidate_profile in candidates
+    )
 
-    prompt = f"""You are an expert matchmaker analyzing compatibility between two USC students for a blind date matching program.
+    return f"""PERSON A:
+{profile}
 
-Here are their profiles:
+{candidate_profiles}"""
 
-PERSON A:
-{profile1}
 
-PERSON B:
-{profile2}
+def parse_compatibility_response(response_text, candidate_ids):
+    """
+    Parse Claude's JSON compatibility evaluations (the rest of the reply after JSON_PREFILL).
+    Returns a dict mapping each candidate id to its evaluation.
+    Raises ValueError if the reply isn't valid JSON or doesn't have the expected structure.
+    """
+    try:
+        evaluations = {int(evaluation['id']): evaluation
+                       for evaluation in json.loads(JSON_PREFILL + response_text)['evaluations']}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Malformed compatibility response: {e!r}") from e
+
+    results = {}
+    for candidate_id in candidate_ids:
+        if candidate_id not in evaluations:
+            results[candidate_id] = failed_evaluation("No evaluation returned for this pair")
+            continue
+        try:
+            results[candidate_id] = validate_evaluation(evaluations[candidate_id])
+        except ValueError as e:
+            results[candidate_id] = failed_evaluation(e)
+    return results
 
-Please analyze their compatibility across these dimensions:
-1. Personality compatibility (traits, social energy, lifestyle)
-2. Shared interests and hobbies
-3. What each person wants vs. what the other person offers
-4. Lifestyle alignment (drinking, ambition, social habits)
-5. Deal-breakers (if any)
 
-Provide your analysis in JSON format:
-{{
-    "compatibility_score": <number 0-100>,
-    "reasoning": "<2-3 sentence explanation>",
-    "shared_interests": ["<interest1>", "<interest2>"],
-    "key_matches": ["<what makes them compatible>"],
-    "potential_concerns": ["<any concerns>"]
-}}
+def message_text(message):
+    """Get the text of a Claude reply ('' if it has no text blocks)."""
+    return "".join(block.text for block in message.content if block.type == "text")
 
-Be honest - some matches will be great (80-100), some okay (50-79), some poor (0-49)."""
 
+def validate_evaluation(evaluation):
+    """
+    Check that an evaluation has a finite numeric compatibility_score and a reasoning string.
+    Returns the evaluation with its score as a number (whole scores stay ints), or raises ValueError.
+    """
+    if not isinstance(evaluation, dict):
+        raise ValueError(f"Evaluation is not an object: {evaluation!r}")
     try:
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        # Parse the JSON response
-        response_text = message.content[0].text
-
-        # Extract JSON from response (handle markdown code blocks)
-        if "```json" in response_text:
-            json_str = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            json_str = response_text.split("```")[1].split("```")[0].strip()
-        else:
-            json_str = response_text.strip()
+        score = float(evaluation['compatibility_score'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Invalid compatibility_score: {evaluation.get('compatibility_score')!r}")
+    # json.loads accepts NaN and Infinity, which would break the assignment solver
+    if not math.isfinite(score):
+        raise ValueError(f"Invalid compatibility_score: {evaluation['compatibility_score']!r}")
+    if not isinstance(evaluation.get('reasoning'), str):
+        raise ValueError(f"Invalid reasoning: {evaluation.get('reasoning')!r}")
+
+    return {**evaluation, 'compatibility_score': int(score) if score.is_integer() else score}
+
+
+def failed_evaluation(error):
+    """Default low-score result for a pair whose evaluation failed."""
+    return {
+        "compatibility_score": 0,
+        "reasoning": f"Error: {str(error)}",
+        "shared_interests": [],
+        "key_matches": [],
+        "potential_concerns": ["API evaluation failed"],
+        "failed": True
+    }
+
+
+def hash_profile(profile):
+    """Hash a create_person_profile string for use in pair_cache_key."""
+    return hashlib.blake2b(profile.encode()).hexdigest()
+
+
+def pair_cache_key(profile_hash1, profile_hash2):
+    """
+    Cache key for a pair's evaluation, from both people's hash_profile hashes, the model
+    and the system prompt. The hashes are sorted so (A, B) and (B, A) share a key, and
+    any profile or prompt change gives a new key.
+    """
+    key = "\x1f".join([CLAUDE_MODEL, hash_profile(SYSTEM_PROMPT), *sorted([profile_hash1, profile_hash2])])
+    return hashlib.blake2b(key.encode()).hexdigest()
 
-        result = json.loads(json_str)
-        return result
 
+def load_cached_results(cache, keys):
+    """
+    Look up cached evaluations for pairs, given a dict mapping each pair to its pair_cache_key.
+    Entries that don't pass validate_evaluation are ignored, so those pairs get re-evaluated.
+    Returns a dict mapping each cached pair to its evaluation result.
+    """
+    results = {}
+    for pair, key in keys.items():
+        row = cache.execute("SELECT json FROM compat_cache WHERE key = ?", (key,)).fetchone()
+        if row:
+            try:
+                results[pair] = validate_evaluation(json.loads(row[0]))
+            except ValueError:
+                continue
+    return results
+
+
+def save_results(cache, keys, results):
+    """Save evaluation results to the cache. Failed evaluations aren't saved, so they're retried next run."""
+    cache.executemany(
+        "INSERT OR REPLACE INTO compat_cache VALUES (?, ?)",
+        [(keys[pair], json.dumps(result)) for pair, result in results.items() if not result.get('failed')]
+    )
+    cache.commit()
+
+
+def estimate_tokens(text):
+    """Roughly estimate how many tokens a piece of text is."""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def group_pairs(pairs, profiles):
+    """
+    Group (i, j) pairs by their first person, so each person's profile is sent once for
+    several candidates. Groups hold up to PAIRS_PER_PROMPT candidates, or fewer when
+    their profiles would push the prompt past MAX_PROMPT_TOKENS.
+    Returns a list of (i, [j, ...]) groups.
+    """
+    candidates = {}
+    for i, j in pairs:
+        candidates.setdefault(i, []).append(j)
+
+    groups = []
+    for i, js in candidates.items():
+        base_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(build_compatibility_prompt(profiles[i], []))
+        group, group_tokens = [], base_tokens
+        for j in js:
+            tokens = estimate_tokens(profiles[j])
+            if group and (len(group) == PAIRS_PER_PROMPT or group_tokens + tokens > MAX_PROMPT_TOKENS):
+                groups.append((i, group))
+                group, group_tokens = [], base_tokens
+            group.append(j)
+            group_tokens += tokens
+        groups.append((i, group))
+    return groups
+
+
+def build_group_request(profiles, i, js):
+    """Build the Messages API parameters to evaluate person i against candidates js."""
+    prompt = build_compatibility_prompt(profiles[i], [(j, profiles[j]) for j in js])
+    return {
+        "model": CLAUDE_MODEL,
+        "max_tokens": MAX_TOKENS_PER_PAIR * len(js),
+        "temperature": TEMPERATURE,
+        "system": SYSTEM_PROMPT,
+        "messages": [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": JSON_PREFILL}
+        ]
+    }
+
+
+async def evaluate_compatibility_with_claude(profiles, i, js, client):
+    """
+    Use Claude API to evaluate compatibility between person i and each of the people js.
+    Returns a dict mapping each j to a compatibility score (0-100) and reasoning.
+    Raises ValueError if Claude's reply can't be parsed, so the caller can retry it.
+    """
+    try:
+        message = await client.messages.create(**build_group_request(profiles, i, js))
     except Exception as e:
-        print(f"Error evaluating compatibility: {e}")
+        logging.warning(f"Error evaluating compatibility: {e}")
         # Return a default low score if API call fails
-        return {
-            "compatibility_score": 0,
-            "reasoning": f"Error: {str(e)}",
-            "shared_interests": [],
-            "key_matches": [],
-            "potential_concerns": ["API evaluation failed"]
-        }
+        return {j: failed_evaluation(e) for j in js}
+
+    return parse_compatibility_response(message_text(message), js)
 
 
-def find_matches_with_claude(df, api_key, linkedin_email=None, linkedin_password=None):
+async def evaluate_pairs_with_claude(records, profiles, pairs, api_key, cache, keys):
+    """
+    Evaluate many (i, j) pairs of people concurrently using the async Claude client.
+    records and profiles hold each person's responses and create_person_profile string.
+    API calls are network-bound, so up to MAX_CONCURRENT_REQUESTS run at once,
+    with request starts spaced out to stay under REQUESTS_PER_MINUTE.
+    Each group's results are saved to the cache (under keys) as soon as they arrive,
+    so an interrupted run picks up where it left off.
+    Returns a dict mapping each pair to its evaluation result.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    interval = 60 / REQUESTS_PER_MINUTE
+    next_start = time.monotonic()
+
+    async def wait_for_rate_limit():
+        nonlocal next_start
+        now = time.monotonic()
+        start = max(now, next_start)
+        next_start = start + interval
+        await asyncio.sleep(start - now)
+
+    async def evaluate(client, i, js):
+        # A malformed reply is retried once; each attempt waits its turn under the rate limit
+        for attempt in range(2):
+            async with semaphore:
+                await wait_for_rate_limit()
+                try:
+                    group_results = await evaluate_compatibility_with_claude(profiles, i, js, client)
+                    break
+                except ValueError as e:
+                    logging.warning(f"Error evaluating compatibility: {e}")
+                    group_results = {j: failed_evaluation(e) for j in js}
+
+        progress.update(len(group_results))
+        j, result = next(iter(group_results.items()))
+        progress.set_postfix(last=f"{records[i]['name']} + {records[j]['name']}: {result['compatibility_score']}%")
+
+        group_results = {(i, j): result for j, result in group_results.items()}
+        save_results(cache, keys, group_results)
+        return group_results
+
+    with tqdm(total=len(pairs), desc="Evaluating pairs", unit="pair", disable=not pairs) as progress:
+        async with anthropic.AsyncAnthropic(api_key=api_key, max_retries=MAX_RETRIES) as client:
+            group_results = await asyncio.gather(*[evaluate(client, i, js) for i, js in group_pairs(pairs, profiles)])
+
+    results = {}
+    for group_result in group_results:
+        results.update(group_result)
+    return results
+
+
+async def collect_batch_results(client, batch_id, groups, cache):
+    """
+    Wait for a Message Batches API submission to finish, then read back its results,
+    saving them to the cache as they're read. groups lists each request's
+    (i, js, pair_cache_keys) in custom_id order.
+    Returns a dict mapping each pair to its evaluation result.
+    """
+    batch = await client.messages.batches.retrieve(batch_id)
+    while batch.processing_status != "ended":
+        await asyncio.sleep(BATCH_POLL_SECONDS)
+        batch = await client.messages.batches.retrieve(batch_id)
+        print(f"  {batch.request_counts.processing} requests still processing...")
+
+    results = {}
+    async for entry in await client.messages.batches.results(batch_id):
+        i, js, group_keys = groups[int(entry.custom_id.split('_')[1])]
+        try:
+            if entry.result.type != "succeeded":
+                raise RuntimeError(f"batch request {entry.result.type}")
+            group_results = parse_compatibility_response(message_text(entry.result.message), js)
+        except Exception as e:
+            logging.warning(f"Error evaluating compatibility: {e}")
+            group_results = {j: failed_evaluation(e) for j in js}
+
+        save_results(cache, dict(zip(js, group_keys)), group_results)
+        results.update({(i, j): result for j, result in group_results.items()})
+
+    cache.execute("DELETE FROM pending_batches WHERE id = ?", (batch_id,))
+    cache.commit()
+    return results
+
+
+async def evaluate_pairs_with_batch_api(profiles, pairs, api_key, cache, keys):
+    """
+    Evaluate many (i, j) pairs of people in a single Message Batches API submission.
+    profiles holds each person's create_person_profile string.
+    Batches cost ~50% less than individual requests and avoid per-request rate limits,
+    but take longer to come back (usually minutes, up to 24 hours).
+    The submitted batch is recorded in the cache until its results (saved under keys)
+    have been read, so if a run is interrupted while waiting, the next run picks the
+    same batch back up instead of submitting (and paying for) a new one.
+    Returns a dict mapping each pair to its evaluation result.
+    """
+    async with anthropic.AsyncAnthropic(api_key=api_key, max_retries=MAX_RETRIES) as client:
+        for batch_id, groups in cache.execute("SELECT id, groups FROM pending_batches").fetchall():
+            print(f"Resuming batch {batch_id} from an interrupted run, waiting for results...")
+            try:
+                await collect_batch_results(client, batch_id, json.loads(groups), cache)
+            except anthropic.APIStatusError as e:
+                # e.g. the batch's results have expired - its pairs just get evaluated again
+                logging.warning(f"Could not resume batch {batch_id}: {e}")
+                cache.execute("DELETE FROM pending_batches WHERE id = ?", (batch_id,))
+                cache.commit()
+
+        # Rows may have changed since an interrupted run, so take its results from the cache by key
+        results = load_cached_results(cache, {pair: keys[pair] for pair in pairs})
+        pairs = [pair for pair in pairs if pair not in results]
+        if not pairs:
+            return results
+
+        groups = [(i, js, [keys[(i, j)] for j in js]) for i, js in group_pairs(pairs, profiles)]
+        requests = [
+            {"custom_id": f"group_{k}", "params": build_group_request(profiles, i, js)}
+            for k, (i, js, _) in enumerate(groups)
+        ]
+
+        batch = await client.messages.batches.create(requests=requests)
+        cache.execute("INSERT OR REPLACE INTO pending_batches VALUES (?, ?)", (batch.id, json.dumps(groups)))
+        cache.commit()
+        print(f"Submitted batch {batch.id} with {len(pairs)} pairs, waiting for results...")
+
+        results.update(await collect_batch_results(client, batch.id, groups, cache))
+
+    return results
+
+
+def find_matches_with_claude(df, api_key, linkedin_email=None, linkedin_password=None, use_batch_api=False):
     """
     Find optimal matches using Claude API for compatibility evaluation.
     Optionally includes LinkedIn data if credentials are provided.
+    With use_batch_api, pairs are evaluated through the (cheaper, slower) Message Batches API.
     """
-    client = anthropic.Anthropic(api_key=api_key)
-
     # Initialize LinkedIn client if credentials provided
     linkedin_client = None
     if linkedin_email and linkedin_password:
@@ -322,82 +731,93 @@ def find_matches_with_claude(df, api_key, linkedin_email=None, linkedin_password
 
     n = len(df)
 
+    # Plain dicts are much cheaper to access than df.iloc rows
+    records = df.to_dict('records')
+
+    # LinkedIn data and Claude's evaluations from earlier runs are reused from here
+    cache = open_cache()
+
     # Fetch LinkedIn data for all people first
     if linkedin_client:
         print(f"Fetching LinkedIn data for {n} people...")
-        for i in range(n):
-            person = df.iloc[i]
-            linkedin_url = person.get('linkedin_url')
-            if linkedin_url and not pd.isna(linkedin_url):
-                linkedin_data = get_linkedin_data(linkedin_client, linkedin_url)
-                df.at[i, 'linkedin_data'] = linkedin_data
+        asyncio.run(fetch_all_linkedin_data(linkedin_client, records, cache))
         print("✓ LinkedIn data fetching complete\n")
 
-    compatibility = {}
-
     print(f"Evaluating compatibility for {n} people using Claude API...")
+    print(f"System prompt hash: {hash_profile(SYSTEM_PROMPT)[:16]}")
     print("This may take a few minutes...\n")
 
-    # Evaluate all compatible pairs
-    pair_count = 0
-    for i in range(n):
-        for j in range(i + 1, n):
-            person1 = df.iloc[i]
-            person2 = df.iloc[j]
-
-            # Quick orientation check first (no API call needed)
-            if not is_compatible_orientation(person1, person2):
-                continue
-
-            pair_count += 1
-            print(f"Evaluating pair {pair_count}: {person1['name']} + {person2['name']}...", end=" ")
-
-            # Use Claude to evaluate this pair
-            result = evaluate_compatibility_with_claude(person1, person2, client)
-            score = result['compatibility_score']
-
-            print(f"Score: {score}%")
-
-            if score > 0:
-                compatibility[(i, j)] = {
-                    'score': score,
-                    'reasoning': result['reasoning'],
-                    'shared_interests': result.get('shared_interests', []),
-                    'key_matches': result.get('key_matches', []),
-                    'potential_concerns': result.get('potential_concerns', [])
-                }
-
-    print(f"\nFound {len(compatibility)} compatible pairs")
+    # Quick orientation and dealbreaker checks for every pair at once (no API call needed)
+    gender_mask, interest_mask = encode_orientation(df)
+    flags = encode_quick_filters(df)
+    rows, cols = np.arange(n)[:, None], np.arange(n)[None, :]
+    compatible = np.triu(is_compatible_orientation(gender_mask, interest_mask, rows, cols)
+                         & ~quick_incompatibility(flags, rows, cols), k=1)
+
+    # Build each person's profile once - it's reused in every pair they're part of
+    profiles = [create_person_profile(person) for person in records]
+
+    # Only send each person's most similar candidates to Claude
+    if n > MAX_CANDIDATES_PER_PERSON:
+        similarity = profile_similarity_matrix(profiles)
+        if similarity is not None:
+            compatible = keep_top_edges(compatible, similarity, MAX_CANDIDATES_PER_PERSON)
+
+    # Reuse cached evaluations of pairs whose profiles haven't changed
+    pairs = [(int(i), int(j)) for i, j in zip(*np.nonzero(compatible))]
+    profile_hashes = [hash_profile(profile) for profile in profiles]
+    keys = {(i, j): pair_cache_key(profile_hashes[i], profile_hashes[j]) for i, j in pairs}
+    results = load_cached_results(cache, keys)
+    pairs = [pair for pair in pairs if pair not in results]
+    if results:
+        print(f"Reusing {len(results)} cached evaluations, {len(pairs)} pairs left to evaluate")
+
+    # Evaluate all remaining compatible pairs (saving results to the cache as they come in)
+    if use_batch_api:
+        results.update(asyncio.run(evaluate_pairs_with_batch_api(profiles, pairs, api_key, cache, keys)))
+    else:
+        results.update(asyncio.run(evaluate_pairs_with_claude(records, profiles, pairs, api_key, cache, keys)))
+    cache.close()
 
     # Create graph for maximum weight matching
     G = nx.Graph()
 
     # Add all people as nodes
-    for i in range(n):
-        G.add_node(i)
-
-    # Add edges with weights
-    for (i, j), data in compatibility.items():
-        G.add_edge(i, j, weight=data['score'])
+    G.add_nodes_from(range(n))
+
+    # Add edges with weights, keeping Claude's evaluation on the edge so the
+    # matches can be read straight back from the graph
+    for (i, j), result in results.items():
+        score = result['compatibility_score']
+        if score > 0:
+            G.add_edge(i, j,
+                       weight=score,
+                       reasoning=result.get('reasoning', ''),
+                       shared_interests=result.get('shared_interests', []),
+                       key_matches=result.get('key_matches', []),
+                       potential_concerns=result.get('potential_concerns', []))
+    del results
+
+    print(f"\nFound {G.number_of_edges()} compatible pairs")
 
     # Find maximum weight matching
-    matching = nx.max_weight_matching(G, maxcardinality=False)
+    matching = max_weight_matching(G)
 
     # Convert to readable format with full compatibility data
     matches = []
     for i, j in matching:
-        person1 = df.iloc[i]
-        person2 = df.iloc[j]
-        comp_data = compatibility.get((min(i, j), max(i, j)), {})
+        person1 = records[i]
+        person2 = records[j]
+        edge = G[i][j]
 
         matches.append({
             'person1': person1,
             'person2': person2,
-            'score': comp_data.get('score', 0),
-            'reasoning': comp_data.get('reasoning', ''),
-            'shared_interests': comp_data.get('shared_interests', []),
-            'key_matches': comp_data.get('key_matches', []),
-            'potential_concerns': comp_data.get('potential_concerns', [])
+            'score': edge['weight'],
+            'reasoning': edge['reasoning'],
+            'shared_interests': edge['shared_interests'],
+            'key_matches': edge['key_matches'],
+            'potential_concerns': edge['potential_concerns']
         })
 
     # Sort by compatibility score (highest first)
@@ -437,12 +857,14 @@ def export_matches(matches, output_file='matches_api.csv'):
 def main():
     """Main function to run the Claude API matcher."""
     if len(sys.argv) < 2:
-        print("Usage: python matcher_api.py <responses.csv>")
+        print("Usage: python matcher_api.py <responses.csv> [--batch]")
+        print("\n  --batch  Use the Message Batches API (~50% cheaper, can take a while)")
         print("\nMake sure to set your ANTHROPIC_API_KEY environment variable:")
         print("  export ANTHROPIC_API_KEY='your-api-key-here'")
         sys.exit(1)
 
     csv_file = sys.argv[1]
+    use_batch_api = '--batch' in sys.argv[2:]
 
     # Get API key from environment
     api_key = os.environ.get('ANTHROPIC_API_KEY')
@@ -471,7 +893,7 @@ def main():
 
     # Find matches using Claude API
     print("\nFinding optimal matches using Claude AI...")
-    matches = find_matches_with_claude(df, api_key, linkedin_email, linkedin_password)
+    matches = find_matches_with_claude(df, api_key, linkedin_email, linkedin_password, use_batch_api)
 
     print(f"\nFound {len(matches)} matches!")
     print(f"{len(df) - (len(matches) * 2)} people unmatched")